@@ -52,6 +52,8 @@ era = ls2d.Read_era5(settings)
 # Calculate large-scale forcings:
 # `n_av` is the number of ERA5 gridpoints (+/-) over which
 # the ERA5 variables and forcings are averaged.
+# NOTE: to compare methods, call `calculate_forcings()` + `get_les_input()`
+# again on the same `era` object; there is no need to copy it.
 era.calculate_forcings(n_av=1, method='2nd')
 
 # Interpolate ERA5 to fixed height grid:
@@ -74,11 +74,22 @@ class IFS_tools:
         Equation: p = a + b * ps
         Top value is set to a small non-zero number to prevent div-by-0's
         Keyword arguments: 
-            ps -- surface pressure (Pa)
+            ps -- surface pressure (Pa), scalar or array with shape (time, ...)
+        Returns half level pressure with shape (nhalf) for scalar `ps`,
+        or shape (time, nhalf, ...) for array `ps`.
         """
 
-        ph = self.a + self.b * ps
-        ph[-1] = 0.34     # Chosen to match IFS values for standard atmosphere
+        ps = np.asarray(ps)
+
+        if ps.ndim == 0:
+            ph = self.a + self.b * ps
+            ph[-1] = 0.34     # Chosen to match IFS values for standard atmosphere
+        else:
+            # Broadcast coefficients (nhalf) and `ps` (time, ...) to (time, nhalf, ...)
+            shape = (-1,) + (ps.ndim-1) * (1,)
+            ph = self.b.reshape(shape) * ps[:,np.newaxis]
+            ph += self.a.reshape(shape)
+            ph[:,-1] = 0.34
         return ph
 
     def calc_full_level_pressure(self, ps):
@@ -87,11 +98,17 @@ class IFS_tools:
         Equation: p = a + b * ps
         See IFS part III, eq. 2.11
         Keyword arguments: 
-            ps -- surface pressure (Pa)
+            ps -- surface pressure (Pa), scalar or array with shape (time, ...)
+        Returns full level pressure with shape (nfull) for scalar `ps`,
+        or shape (time, nfull, ...) for array `ps`.
         """
 
         p = self.calc_half_level_pressure(ps)
-        return 0.5 * (p[1:] + p[:-1])
+
+        # Vertical dimension is the first (1D) or second (time, level, ...) axis.
+        ax = 0 if p.ndim == 1 else 1
+        p = np.moveaxis(p, ax, 0)
+        return np.moveaxis(0.5 * (p[1:] + p[:-1]), 0, ax)
 
     def calc_half_level_Zg(self, ph, Tv):
         """
@@ -99,16 +116,27 @@ class IFS_tools:
         Equation: sums dZg = -Rd / g * Tv * ln(p+ / p-)
         See IFS part III, eq. 2.20-2.21
         Keyword arguments: 
-            ph -- half level pressure (Pa)
-            Tv -- full level virtual temperature (K) 
-    `    """
+            ph -- half level pressure (Pa), shape (nhalf) or (time, nhalf, ...)
+            Tv -- full level virtual temperature (K), shape (nfull) or (time, nfull, ...)
+        """
 
-        pfrac = ph[1:] / ph[:-1]
-        dZg   = -self.Rd * Tv * np.log(pfrac) / self.grav
-        Zg    = np.cumsum(dZg) 
-        Zg    = np.insert(Zg, 0, 0) 
+        # Vertical dimension is the first (1D) or second (time, level, ...) axis.
+        ax = 0 if ph.ndim == 1 else 1
+        ph = np.moveaxis(ph, ax, 0)
+        Tv = np.moveaxis(Tv, ax, 0)
 
-        return Zg
+        # dZg = -Rd/g * Tv * ln(p+ / p-), evaluated in-place to
+        # prevent (time, level, lat, lon) sized temporary arrays.
+        dZg = ph[1:] / ph[:-1]
+        np.log(dZg, out=dZg)
+        dZg *= Tv
+        dZg *= -self.Rd / self.grav
+
+        # Integrate from the surface (Zg=0) upwards.
+        Zg = np.zeros(ph.shape, dtype=dZg.dtype)
+        np.cumsum(dZg, axis=0, out=Zg[1:])
+
+        return np.moveaxis(Zg, 0, ax)
 
     def calc_full_level_Zg(self, ph, Tv):
         """
@@ -116,12 +144,16 @@ class IFS_tools:
         Equation: sums dZg = -Rd / g * Tv * ln(p+ / p-)
         See IFS part III, eq. 2.20-2.21
         Keyword arguments: 
-            ph -- half level pressure (Pa)
-            Tv -- full level virtual temperature (K) 
+            ph -- half level pressure (Pa), shape (nhalf) or (time, nhalf, ...)
+            Tv -- full level virtual temperature (K), shape (nfull) or (time, nfull, ...)
         """
 
         Zg = self.calc_half_level_Zg(ph, Tv)
-        return 0.5 * (Zg[1:] + Zg[:-1])
+
+        # Vertical dimension is the first (1D) or second (time, level, ...) axis.
+        ax = 0 if Zg.ndim == 1 else 1
+        Zg = np.moveaxis(Zg, ax, 0)
+        return np.moveaxis(0.5 * (Zg[1:] + Zg[:-1]), 0, ax)
 
     def calc_virtual_temp(self, T, qv, ql=0, qi=0, qr=0, qs=0):
         """
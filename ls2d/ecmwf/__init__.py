@@ -22,5 +22,5 @@ from .download_era5 import download_era5
 from .download_cams import download_cams
 from .patch_cds_ads import patch_netcdf
 
-from .read_era5 import Read_era5
+from .read_era5 import Read_era5, get_les_input_chunked
 from .read_cams import Read_cams
@@ -24,7 +24,6 @@ import datetime
 import sys
 import os
 import dill as pickle
-import requests
 import yaml
 
 # Third party modules
@@ -34,7 +33,6 @@ import numpy as np
 # LS2D modules
 import ls2d.ecmwf.era_tools as era_tools
 from ls2d.src.messages import *
-from ls2d.ecmwf.patch_cds_ads import patch_netcdf
 
 # Yikes, but necessary (?) if you want to use
 # MARS downloads without the Python CDS api installed?
@@ -130,41 +128,11 @@ def _download_cams_file(settings, variables, grid):
     pickle_file = '{}.pickle'.format(nc_file[:-3])
 
     if os.path.isfile(pickle_file):
-        message('Found previous CDS request!')
-
-        with open(pickle_file, 'rb') as f:
-            cds_request = pickle.load(f)
-
-            try:
-                cds_request.update()
-            except requests.exceptions.HTTPError:
-                error('CDS request is no longer available online!', exit=False)
-                error('To continue, delete the previous request: {}'.format(pickle_file))
-
-            state = cds_request.reply['state']
-
-            if state == 'completed':
-                message('Request finished, downloading NetCDF file')
-
-                cds_request.download(nc_file)
-                os.remove(pickle_file)
-
-                patch_netcdf(nc_file)
-
-                if grid is not None:
-                    message(f'Re-gridding NetCDF to {grid:.2f}°×{grid:.2f}° degree grid.')
-                    regrid(nc_file, settings['central_lon'], settings['central_lat'], grid)
-
-                finished = True
-
-            elif state in ('accepted', 'queued', 'running'):
-                message('Request not finished, current status = \"{}\"'.format(state))
-
-            else:
-                error('Request failed, status = \"{}\"'.format(state), exit=False)
-                message('Error message = {}'.format(cds_request.reply['error'].get('message')))
-                message('Error reason = {}'.format(cds_request.reply['error'].get('reason')))
+        finished = era_tools.download_cds_request(pickle_file, nc_file)
 
+        if finished and grid is not None:
+            message(f'Re-gridding NetCDF to {grid:.2f}°×{grid:.2f}° degree grid.')
+            regrid(nc_file, settings['central_lon'], settings['central_lat'], grid)
 
     else:
         message('No previous CDS request, submitting new one')
@@ -21,17 +21,15 @@
 # Python modules
 import subprocess as sp
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import sys,os
 import dill as pickle
 import requests
 
-# Third party modules
-import numpy as np
-
 # LS2D modules
 import ls2d.ecmwf.era_tools as era_tools
 from ls2d.src.messages import *
-from ls2d.ecmwf.patch_cds_ads import patch_netcdf
 
 # Yikes, but necessary (?) if you want to use
 # MARS downloads without the Python CDS api installed?
@@ -40,52 +38,259 @@ try:
 except ImportError:
     cdsapi = None
 
+# Static parts of the CDS/MARS requests.
+_analysis_times = [f'{i:02d}:00' for i in range(24)]
+_analysis_times_mars = '/'.join([f'{i:02d}:00:00' for i in range(24)])
+_model_levels = '1/to/137/by/1'
+_pressure_levels = [
+    '1', '2', '3', '5', '7', '10', '20', '30', '50', '70', '100', '125', '150', '175', '200',
+    '225', '250', '300', '350', '400', '450', '500', '550', '600', '650', '700', '750',
+    '775', '800', '825', '850', '875', '900', '925', '950', '975', '1000']
+_pressure_levels_mars = '/'.join(_pressure_levels)
+
+# Per download type (`ftype`) CDS dataset name + request entries.
+_cds_params = {
+    'pressure_an': ('reanalysis-era5-pressure-levels', {
+        'pressure_level': _pressure_levels,
+        'variable': 'geopotential'}),
+    'surface_an': ('reanalysis-era5-single-levels', {
+        'variable': [
+            'instantaneous_moisture_flux', 'high_vegetation_cover', 'leaf_area_index_high_vegetation',
+            'leaf_area_index_low_vegetation', 'low_vegetation_cover', 'sea_surface_temperature',
+            'skin_temperature', 'soil_temperature_level_1', 'soil_temperature_level_2',
+            'soil_temperature_level_3', 'soil_temperature_level_4', 'soil_type',
+            'surface_pressure', 'instantaneous_surface_sensible_heat_flux', 'type_of_high_vegetation',
+            'type_of_low_vegetation', 'volumetric_soil_water_layer_1', 'volumetric_soil_water_layer_2',
+            'volumetric_soil_water_layer_3', 'volumetric_soil_water_layer_4',
+            'forecast_logarithm_of_surface_roughness_for_heat', 'forecast_surface_roughness']}),
+    'model_an': ('reanalysis-era5-complete', {
+        'class': 'ea',
+        'expver': '1',
+        'levelist': _model_levels,
+        'levtype': 'ml',
+        'param': '75/76/130/131/132/133/135/203/246/247',
+        'stream': 'oper',
+        'time': _analysis_times_mars,
+        'type': 'an',
+        'grid': '0.25/0.25',
+        'format': 'netcdf'})}
+
+# Per download type (`ftype`) SLURM QOS + MARS request entries.
+_mars_params = {
+    'model_an': ('nf', {
+        'levtype'  : 'ml',
+        'type'     : 'an',
+        'levelist' : _model_levels,
+        'time'     : '0/to/23/by/1',
+        'param'    : '75/76/129/130/131/132/133/135/152/246/247/248/203'}),
+    'pressure_an': ('nf', {
+        'levtype'  : 'pl',
+        'type'     : 'an',
+        'levelist' : _pressure_levels_mars,
+        'time'     : '0/to/23/by/1',
+        'param'    : '129.128'}),
+    'surface_an': ('nf', {
+        'levtype'  : 'sfc',
+        'type'     : 'an',
+        'time'     : '0/to/23/by/1',
+        'param'    : '15.128/16.128/17.128/18.128/27.128/28.128/29.128/30.128/34.128/35.128/36.128/37.128/38.128/39.128/40.128/41.128/42.128/43.128/66.128/67.128/74.128/78.128/79.128/89.228/90.228/129.128/134.128/136.128/137.128/139.128/151.128/160.128/161.128/162.128/163.128/164.128/165.128/166.128/167.128/168.128/170.128/172.128/183.128/186.128/187.128/188.128/198.128/229.128/230.128/231.128/232.128/235.128/236.128/243.128/244.128/245.128'})}
+
+# CDS API client, shared by all CDS downloads. See `_get_client()`.
+_client = None
+_client_lock = threading.Lock()
+_stream_lock = threading.Lock()
+
+# Number of concurrent MARS (`sbatch`) submissions.
+_mars_ntasks = 8
+
+
+class _Thread_local_stream:
+    """
+    Replacement of `sys.stdout` or `sys.stderr`, which writes to a thread specific
+    stream (if set), or to the original stream otherwise. This allows each
+    (concurrent) download to write its CDS API prints to its own log file.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
 
-def _retrieve_from_MARS(request, settings, nc_dir, nc_file, qos):
+    def get(self):
+        return getattr(self.local, 'stream', self.stream)
+
+    def write(self, text):
+        return self.get().write(text)
+
+    def flush(self):
+        return self.get().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def _redirect_output(out_file, err_file):
+    """
+    Redirect `sys.stdout` and `sys.stderr` of the calling thread to `out_file` and `err_file`.
+    """
+
+    with _stream_lock:
+        if not isinstance(sys.stdout, _Thread_local_stream):
+            sys.stdout = _Thread_local_stream(sys.stdout)
+        if not isinstance(sys.stderr, _Thread_local_stream):
+            sys.stderr = _Thread_local_stream(sys.stderr)
+
+    sys.stdout.local.stream = open(out_file, 'w')
+    sys.stderr.local.stream = open(err_file, 'w')
+
+
+def _restore_output():
+    """
+    Close the log files of the calling thread, and restore writing to the original streams.
+    """
+
+    for stream in (sys.stdout, sys.stderr):
+        stream.local.stream.close()
+        del stream.local.stream
+
+
+
+def _reset_output():
+    """
+    Replace the `_Thread_local_stream` wrappers by the original `sys.stdout` and `sys.stderr`.
+    """
+
+    with _stream_lock:
+        if isinstance(sys.stdout, _Thread_local_stream):
+            sys.stdout = sys.stdout.stream
+        if isinstance(sys.stderr, _Thread_local_stream):
+            sys.stderr = sys.stderr.stream
+
+
+def _get_client(ntasks=1):
+    """
+    Return the CDS API client. The client is created once, and shared by all
+    (concurrent) CDS downloads, such that the `.cdsapirc` credentials are only
+    read once, and the HTTP connections to CDS are re-used.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = cdsapi.Client(wait_until_complete=False, delete=False)
+
+            # Make sure the connection pool can hold a connection for each concurrent request.
+            session = getattr(_client, 'session', None)
+            if session is not None:
+                pool_size = max(ntasks, requests.adapters.DEFAULT_POOLSIZE)
+                session.mount('https://', requests.adapters.HTTPAdapter(
+                        pool_connections=pool_size, pool_maxsize=pool_size))
+
+        return _client
+
+
+def _build_cds_request(settings, area):
+    """
+    Build CDS request for a single day and download type.
+    Returns the CDS dataset name and request dictionary.
+
+    Arguments:
+        settings : dictionary with (at least) `date` and `ftype`
+        area : tuple with domain bounds (lat_n, lon_w, lat_s, lon_e)
     """
-    Retrieve file from MARS
+
+    dataset, params = _cds_params[settings['ftype']]
+    date = settings['date']
+
+    # Surface and pressure level analysis (`reanalysis-era5-*` datasets) use the CDS
+    # syntax, model level analysis (`reanalysis-era5-complete`) the MARS syntax.
+    if settings['ftype'] == 'model_an':
+        shared = {
+            'date': f'{date:%Y-%m-%d}',
+            'area': '/'.join(str(x) for x in area)}
+    else:
+        shared = {
+            'product_type': 'reanalysis',
+            'format': 'netcdf',
+            'year': f'{date:%Y}',
+            'month': f'{date:%m}',
+            'day': f'{date:%d}',
+            'time': _analysis_times,
+            'area': list(area)}
+
+    return dataset, dict(shared, **params)
+
+
+def _build_mars_request(settings, area):
+    """
+    Build MARS request for a single day and download type.
+    Returns the SLURM QOS and request dictionary.
+
+    Arguments:
+        settings : dictionary with (at least) `date`, `ftype` and `era5_expver`
+        area : tuple with domain bounds (lat_n, lon_w, lat_s, lon_e)
     """
 
-    def execute(task):
-        sp.call(task, shell=True, executable='/bin/bash')
+    qos, params = _mars_params[settings['ftype']]
+
+    shared = {
+        'class'   : 'ea',
+        'expver'  : f'{settings["era5_expver"]}',
+        'stream'  : 'oper',
+        'date'    : f'{settings["date"]:%Y-%m-%d}',
+        'area'    : '/'.join(str(x) for x in area),
+        'grid'    : '0.25/0.25',
+        'format'  : 'netcdf'}
+
+    return qos, dict(shared, **params)
+
+
+def _retrieve_from_MARS(request, settings, nc_dir, nc_file, qos):
+    """
+    Retrieve file from MARS, by submitting a SLURM job.
+    Returns the SLURM job ID.
+    """
 
     clean_name = nc_file[:-3]
-    mars_req   = '{}.mars' .format(clean_name)
-    grib_file  = '{}.grib' .format(clean_name)
-    slurm_job  = '{}.slurm'.format(clean_name)
+    mars_req   = f'{clean_name}.mars'
+    grib_file  = f'{clean_name}.grib'
+    slurm_job  = f'{clean_name}.slurm'
 
     # Wall clock limit
     wc_lim = '03:00:00' if qos == 'express' else '06:00:00'
 
     # Create MARS request
-    f = open(mars_req, 'w')
-    f.write('retrieve,\n')
-    for key, value in request.items():
-        f.write('{}={},\n'.format(key,value))
-    f.write('target=\"{}\"\n'.format(grib_file))
-    f.close()
+    mars_body = 'retrieve,\n' + \
+            ''.join(f'{key}={value},\n' for key, value in request.items()) + \
+            f'target=\"{grib_file}\"\n'
+
+    with open(mars_req, 'w') as f:
+        f.write(mars_body)
 
     # Create SLURM job file
     date  = settings['date']
     ftype = settings['ftype'].split('_')
-    jobname = '{0:04d}{1:02d}{2:02d}{3:}{4:}'.format(date.year, date.month, date.day, ftype[1], ftype[0])
+    jobname = f'{date:%Y%m%d}{ftype[1]}{ftype[0]}'
 
-    f = open(slurm_job, 'w')
-    f.write('#!/bin/ksh\n')
-    f.write('#SBATCH --qos={}\n'.format(qos))
-    f.write('#SBATCH --job-name={}\n'.format(jobname))
-    f.write('#SBATCH --output={}.%N.%j.out\n'.format(slurm_job))
-    f.write('#SBATCH --error={}.%N.%j.err\n'.format(slurm_job))
-    f.write('#SBATCH --chdir={}\n'.format(nc_dir))
-    f.write('#SBATCH --time={}\n\n'.format(wc_lim))
+    slurm_body = \
+            '#!/bin/ksh\n' \
+            f'#SBATCH --qos={qos}\n' \
+            f'#SBATCH --job-name={jobname}\n' \
+            f'#SBATCH --output={slurm_job}.%N.%j.out\n' \
+            f'#SBATCH --error={slurm_job}.%N.%j.err\n' \
+            f'#SBATCH --chdir={nc_dir}\n' \
+            f'#SBATCH --time={wc_lim}\n\n' \
+            f'mars {mars_req}\n' \
+            'module load ecmwf-toolbox \n' \
+            f'grib_to_netcdf -o {nc_file} {grib_file}'
 
-    f.write('mars {}\n'.format(mars_req))
-    f.write('module load ecmwf-toolbox \n')
-    f.write('grib_to_netcdf -o {} {}'.format(nc_file, grib_file))
-    f.close()
+    with open(slurm_job, 'w') as f:
+        f.write(slurm_body)
 
-    # Submit job
-    execute('sbatch {}'.format(slurm_job))
+    # Submit job. With `--parsable`, `sbatch` only prints `job_id[;cluster_name]`.
+    result = sp.run(['sbatch', '--parsable', slurm_job], check=True, stdout=sp.PIPE, universal_newlines=True)
+    job_id = result.stdout.strip().split(';')[0]
+    message(f'Submitted SLURM job {job_id}')
+
+    return job_id
 
 
 def _download_era5_file(settings):
@@ -102,216 +307,100 @@ def _download_era5_file(settings):
                 path : absolute or relative path to save the NetCDF data
                 case : case name used in file name of NetCDF files
                 ftype : level/forecast/analysis switch (in: [model_an, model_fc, pressure_an, surface_an])
+                _era_dir, _era_file : output directory and NetCDF file name
     """
 
-    header('Downloading: {} - {}'.format(settings['date'], settings['ftype']))
+    header(f'Downloading: {settings["date"]} - {settings["ftype"]}')
 
     # Keep track of CDS downloads which are finished:
     finished = False
 
-    # Output file name
-    nc_dir, nc_file = era_tools.era5_file_path(
-            settings['date'].year, settings['date'].month, settings['date'].day,
-            settings['era5_path'], settings['case_name'], settings['ftype'])
+    # Output directory and file name, as computed by `download_era5()`
+    nc_dir, nc_file = settings['_era_dir'], settings['_era_file']
 
     # Write CDS API prints to log file (NetCDF file path/name appended with .out/.err)
     if settings['write_log']:
-        out_file   = '{}.out'.format(nc_file[:-3])
-        err_file   = '{}.err'.format(nc_file[:-3])
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        sys.stdout = open(out_file, 'w')
-        sys.stderr = open(err_file, 'w')
+        out_file = f'{nc_file[:-3]}.out'
+        err_file = f'{nc_file[:-3]}.err'
+        _redirect_output(out_file, err_file)
 
-    # Bounds of domain
-    lat_n = settings['central_lat']+settings['area_size']
-    lat_s = settings['central_lat']-settings['area_size']
-    lon_w = settings['central_lon']-settings['area_size']
-    lon_e = settings['central_lon']+settings['area_size']
+    try:
+        # Bounds of domain
+        lat_n = settings['central_lat']+settings['area_size']
+        lat_s = settings['central_lat']-settings['area_size']
+        lon_w = settings['central_lon']-settings['area_size']
+        lon_e = settings['central_lon']+settings['area_size']
 
-    # Monitor the required download time
-    start = datetime.datetime.now()
+        area = (lat_n, lon_w, lat_s, lon_e)
 
-    # Switch between CDS and MARS downloads
-    if settings['data_source'] == 'CDS':
+        # Monitor the required download time
+        start = datetime.datetime.now()
 
-        # Check if pickle with previous request is available.
-        # If so, try to download NetCDF file, if not, submit new request
-        pickle_file = '{}.pickle'.format(nc_file[:-3])
+        # Switch between CDS and MARS downloads
+        if settings['data_source'] == 'CDS':
 
-        if os.path.isfile(pickle_file):
-            message('Found previous CDS request!')
+            # Check if pickle with previous request is available.
+            # If so, try to download NetCDF file, if not, submit new request
+            pickle_file = f'{nc_file[:-3]}.pickle'
 
-            with open(pickle_file, 'rb') as f:
-                cds_request = pickle.load(f)
+            if os.path.isfile(pickle_file):
+                finished = era_tools.download_cds_request(pickle_file, nc_file)
 
-                try:
-                    cds_request.update()
-                except requests.exceptions.HTTPError:
-                    error('CDS request is no longer available online!', exit=False)
-                    error('To continue, delete the previous request: {}'.format(pickle_file))
+            else:
+                message('No previous CDS request, submitting new one')
 
-                state = cds_request.reply['state']
+                # Get (shared) instance of CDS API
+                server = _get_client(settings.get('ntasks', 1))
 
-                if state == 'completed':
-                    message('Request finished, downloading NetCDF file')
+                # NOTE: surface and pressure level analysis are two different CDS datasets
+                # (`reanalysis-era5-pressure-levels` and `reanalysis-era5-single-levels`), which
+                # can not be merged into a single request. Their queue time is overlapped instead
+                # by running requests concurrently (`ntasks` > 1).
+                dataset, request = _build_cds_request(settings, area)
+                cds_request = server.retrieve(dataset, request)
 
-                    cds_request.download(nc_file)
-                    f.close()
-                    os.remove(pickle_file)
+                # Save pickle for later processing/download
+                with open(pickle_file, 'wb') as f:
+                    pickle.dump(cds_request, f)
 
-                    # Patch NetCDF file, to make the (+/-) identical to the old CDS
-                    # files, and files retrieved from MARS.
-                    patch_netcdf(nc_file)
 
-                    finished = True
+        elif settings['data_source'] == 'MARS':
 
-                elif state in ('queued', 'accepted', 'running'):
-                    message('Request not finished, current status = \"{}\"'.format(state))
+            qos, request = _build_mars_request(settings, area)
 
-                else:
-                    error('Request failed, status = \"{}\"'.format(state), exit=False)
-                    message('Error message = {}'.format(cds_request.reply['error'].get('message')))
-                    message('Error reason = {}'.format(cds_request.reply['error'].get('reason')))
+            # Submit download to SLURM:
+            _retrieve_from_MARS(request, settings, nc_dir, nc_file, qos)
 
-        else:
-            message('No previous CDS request, submitting new one')
-
-            # Create instance of CDS API
-            server = cdsapi.Client(wait_until_complete=False, delete=False)
-
-            # Surface and pressure level analysis, stored on HDs, so downloads are fast :-)
-            if settings['ftype'] == 'pressure_an' or settings['ftype'] == 'surface_an':
-
-                analysis_times = ['{0:02d}:00'.format(i) for i in range(24)]
-                area = [lat_n, lon_w, lat_s, lon_e]
-
-                request = {
-                    'product_type': 'reanalysis',
-                    'format': 'netcdf',
-                    'year': '{0:04d}'.format(settings['date'].year),
-                    'month': '{0:02d}'.format(settings['date'].month),
-                    'day': '{0:02d}'.format(settings['date'].day),
-                    'time': analysis_times,
-                    'area': area,
-                }
-
-                if settings['ftype'] == 'pressure_an':
-                    pressure_levels = [
-                        '1', '2', '3', '5', '7', '10', '20', '30', '50', '70', '100', '125', '150', '175', '200',
-                        '225', '250', '300', '350', '400', '450', '500', '550', '600', '650', '700', '750',
-                        '775', '800', '825', '850', '875', '900', '925', '950', '975', '1000']
-
-                    request.update({
-                        'pressure_level': pressure_levels,
-                        'variable': 'geopotential'})
-
-                    cds_request = server.retrieve('reanalysis-era5-pressure-levels', request)
-
-                elif settings['ftype'] == 'surface_an':
-                    request.update({
-                        'variable': [
-                            'instantaneous_moisture_flux', 'high_vegetation_cover', 'leaf_area_index_high_vegetation',
-                            'leaf_area_index_low_vegetation', 'low_vegetation_cover', 'sea_surface_temperature',
-                            'skin_temperature', 'soil_temperature_level_1', 'soil_temperature_level_2',
-                            'soil_temperature_level_3', 'soil_temperature_level_4', 'soil_type',
-                            'surface_pressure', 'instantaneous_surface_sensible_heat_flux', 'type_of_high_vegetation',
-                            'type_of_low_vegetation', 'volumetric_soil_water_layer_1', 'volumetric_soil_water_layer_2',
-                            'volumetric_soil_water_layer_3', 'volumetric_soil_water_layer_4',
-                            'forecast_logarithm_of_surface_roughness_for_heat', 'forecast_surface_roughness']})
-
-                    cds_request = server.retrieve('reanalysis-era5-single-levels', request)
-
-            # Model level analysis, stored in tape archive, so downloads are VERY slow :-(
-            elif settings['ftype'] == 'model_an':
-
-                model_levels = '/'.join(list(np.arange(1,138).astype(str)))
-                analysis_times = '/'.join(['{0:02d}:00:00'.format(i) for i in range(24)])
-
-                request = {
-                    'class': 'ea',
-                    'date': '{0:04d}-{1:02d}-{2:02d}'.format(
-                        settings['date'].year, settings['date'].month, settings['date'].day),
-                    'expver': '1',
-                    'levelist': model_levels,
-                    'levtype': 'ml',
-                    'param': '75/76/130/131/132/133/135/203/246/247',
-                    'stream': 'oper',
-                    'time': analysis_times,
-                    'type': 'an',
-                    'area': '{}/{}/{}/{}'.format(lat_n, lon_w, lat_s, lon_e),
-                    'grid': '0.25/0.25',
-                    'format': 'netcdf'}
-
-                cds_request = server.retrieve('reanalysis-era5-complete', request)
-
-            # Save pickle for later processing/download
-            with open(pickle_file, 'wb') as f:
-                pickle.dump(cds_request, f)
-
-
-    elif settings['data_source'] == 'MARS':
-
-        # Shared set of CDS Python API settings for all download types:
-        request = {
-            'class'   : 'ea',
-            'expver'  : '{}'.format(settings['era5_expver']),
-            'stream'  : 'oper',
-            'date'    : '{0:04d}-{1:02d}-{2:02d}'.format(
-                settings['date'].year, settings['date'].month, settings['date'].day),
-            'area'    : '{}/{}/{}/{}'.format(lat_n, lon_w, lat_s, lon_e),
-            'grid'    : '0.25/0.25',
-            'format'  : 'netcdf',
-        }
-
-        # Model levels and time steps to retrieve
-        model_levels = '1/to/137/by/1'
-        press_levels = '1/2/3/5/7/10/20/30/50/70/100/125/150/175/200/225/250/300/350/400/450/\
-    500/550/600/650/700/750/775/800/825/850/875/900/925/950/975/1000'
-
-        an_times = '0/to/23/by/1'
-
-        # Update request based on level/analysis/forecast:
-        if settings['ftype'] == 'model_an':
-            qos = 'nf'
-            request.update({
-                'levtype'  : 'ml',
-                'type'     : 'an',
-                'levelist' : model_levels,
-                'time'     : an_times,
-                'param'    : '75/76/129/130/131/132/133/135/152/246/247/248/203'
-            })
-
-        elif settings['ftype'] == 'pressure_an':
-            qos = 'nf'
-            request.update({
-                'levtype'  : 'pl',
-                'type'     : 'an',
-                'levelist' : press_levels,
-                'time'     : an_times,
-                'param'    : '129.128'
-            })
-
-        elif settings['ftype'] == 'surface_an':
-            qos = 'nf'
-            request.update({
-                'levtype'  : 'sfc',
-                'type'     : 'an',
-                'time'     : an_times,
-                'param'    : '15.128/16.128/17.128/18.128/27.128/28.128/29.128/30.128/34.128/35.128/36.128/37.128/38.128/39.128/40.128/41.128/42.128/43.128/66.128/67.128/74.128/78.128/79.128/89.228/90.228/129.128/134.128/136.128/137.128/139.128/151.128/160.128/161.128/162.128/163.128/164.128/165.128/166.128/167.128/168.128/170.128/172.128/183.128/186.128/187.128/188.128/198.128/229.128/230.128/231.128/232.128/235.128/236.128/243.128/244.128/245.128'
-            })
-
-        # Submit download to SLURM:
-        _retrieve_from_MARS(request, settings, nc_dir, nc_file, qos)
-
-    # Restore printing to screen
-    if settings['write_log']:
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
+    finally:
+        # Restore printing to screen
+        if settings['write_log']:
+            _restore_output()
 
     return finished
 
 
+def _list_local_files(era_dir):
+    """
+    Return set with names of the files in `era_dir`.
+    """
+
+    with os.scandir(era_dir) as entries:
+        return {entry.name for entry in entries if entry.is_file()}
+
+
+def _remove_incomplete_download(era_file, local_files):
+    """
+    Remove the incomplete (`.part`) download of `era_file` from a previous (interrupted) run,
+    if present in `local_files`. Only called for files which are queued for download,
+    to leave the in-progress downloads of other files/processes alone.
+    """
+
+    part_file = f'{era_file}.part'
+    if os.path.basename(part_file) in local_files:
+        message(f'Removing incomplete download {part_file}')
+        os.remove(part_file)
+
+
 def download_era5(settings, exit_when_waiting=True):
     """
     Download all required ERA5 fields for an experiment
@@ -334,13 +423,15 @@ def download_era5(settings, exit_when_waiting=True):
             Directory to save files
         case : string
             Case name used in file name of NetCDF files
+        ntasks : int, optional (default = 1)
+            Number of concurrent CDS requests
     """
 
-    header('Downloading ERA5 for period: {} to {}'.format(settings['start_date'], settings['end_date']))
+    header(f'Downloading ERA5 for period: {settings["start_date"]} to {settings["end_date"]}')
 
     # Check if output directory exists, and ends with '/'
     if not os.path.isdir(settings['era5_path']):
-        error('Output directory \"{}\" does not exist!'.format(settings['era5_path']))
+        error(f'Output directory \"{settings["era5_path"]}\" does not exist!')
     if settings['era5_path'][-1] != '/':
         settings['era5_path'] += '/'
 
@@ -366,29 +457,60 @@ def download_era5(settings, exit_when_waiting=True):
     else:
         blacklist = []
 
-    # Loop over all required files, check if there is a local version, if not add to download queue
-    # Analysis files:
-    for date in an_dates:
-        for ftype in ['model_an', 'pressure_an', 'surface_an']:
-            if ftype not in blacklist:
-                era_dir, era_file = era_tools.era5_file_path(
-                        date.year, date.month, date.day, settings['era5_path'], settings['case_name'], ftype)
-
-                if not os.path.exists(era_dir):
-                    message('Creating output directory {}'.format(era_dir))
-                    os.makedirs(era_dir)
-
-                if os.path.isfile(era_file):
-                    message('Found {} - {} local'.format(date, ftype))
-                else:
-                    settings_tmp = download_settings.copy()
-                    settings_tmp.update({'date': date, 'ftype':ftype})
-                    download_queue.append(settings_tmp)
-
-    finished = True
-    for req in download_queue:
-        if not _download_era5_file(req):
-            finished = False
+    ftypes = [ftype for ftype in ['model_an', 'pressure_an', 'surface_an'] if ftype not in blacklist]
+
+    # Output directory and file name of all required analysis files.
+    era_files = {(date, ftype): era_tools.era5_file_path(
+            date.year, date.month, date.day, settings['era5_path'], settings['case_name'], ftype)
+            for date in an_dates for ftype in ftypes}
+
+    # Create the output directories (one per day) once, and list their contents. Listing
+    # the local files per directory, instead of checking each file separately, is
+    # much faster on networked file systems.
+    local_files = {}
+    for era_dir, era_file in era_files.values():
+        if era_dir not in local_files:
+            os.makedirs(era_dir, exist_ok=True)
+            local_files[era_dir] = _list_local_files(era_dir)
+
+    # Check if there is a local version of each file, if not add to download queue.
+    for (date, ftype), (era_dir, era_file) in era_files.items():
+        if os.path.basename(era_file) in local_files[era_dir]:
+            message(f'Found {date} - {ftype} local')
+        else:
+            _remove_incomplete_download(era_file, local_files[era_dir])
+            settings_tmp = download_settings.copy()
+            settings_tmp.update({'date': date, 'ftype':ftype, '_era_dir': era_dir, '_era_file': era_file})
+            download_queue.append(settings_tmp)
+
+    if not download_queue:
+        message('All ERA5 files present locally, nothing to download')
+        return True
+
+    # Number of concurrent CDS requests. CDS recommends not to exceed ~5 requests.
+    # MARS requests only write the request/job files and call `sbatch`, so these are
+    # always submitted concurrently, using the same (plain) thread pool as CDS, which
+    # also works from environments with a running event loop (e.g. Jupyter notebooks).
+    if settings['data_source'] == 'MARS':
+        ntasks = min(_mars_ntasks, len(download_queue))
+    else:
+        ntasks = settings.get('ntasks', 1)
+
+    try:
+        if ntasks > 1:
+            # The CDS requests (waiting on the CDS server/queue) and MARS submissions (`sbatch`)
+            # are I/O bound, so they are run in a pool of `ntasks` threads.
+            with ThreadPoolExecutor(max_workers=ntasks) as executor:
+                finished = all(executor.map(_download_era5_file, download_queue))
+        else:
+            finished = True
+            for req in download_queue:
+                if not _download_era5_file(req):
+                    finished = False
+    finally:
+        # Stop redirecting output to the log files of the individual downloads.
+        if settings['write_log']:
+            _reset_output()
 
     if not finished:
         if settings['data_source'] == 'CDS':
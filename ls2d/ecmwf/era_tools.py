@@ -20,11 +20,15 @@
 
 # Python modules
 import datetime
+import os
+import dill as pickle
+import requests
 
 # Third party modules
 
 # LS2D modules
 from ls2d.src.messages import *
+from ls2d.ecmwf.patch_cds_ads import patch_netcdf
 
 
 def era5_file_path(year, month, day, path, case, ftype, return_dir=True):
@@ -32,8 +36,8 @@ def era5_file_path(year, month, day, path, case, ftype, return_dir=True):
     Return saving path of files in format `path/yyyy/mm/dd/type.nc`
     """
 
-    era_dir = "{0}/{1}/{2:04d}/{3:02d}/{4:02d}".format(path, case, year, month, day)
-    era_file = "{0}/{1}.nc".format(era_dir, ftype)
+    era_dir = f'{path}/{case}/{year:04d}/{month:02d}/{day:02d}'
+    era_file = f'{era_dir}/{ftype}.nc'
 
     if return_dir:
         return era_dir, era_file
@@ -41,6 +45,55 @@ def era5_file_path(year, month, day, path, case, ftype, return_dir=True):
         return era_file
 
 
+def download_cds_request(pickle_file, nc_file):
+    """
+    Check the status of a previously submitted (pickled) CDS/ADS request,
+    and if the request is finished, download and patch the NetCDF file.
+    Returns True if the NetCDF file is downloaded, False otherwise.
+    """
+
+    message('Found previous CDS request!')
+
+    with open(pickle_file, 'rb') as f:
+        cds_request = pickle.load(f)
+
+    try:
+        cds_request.update()
+    except requests.exceptions.HTTPError:
+        error('CDS request is no longer available online!', exit=False)
+        error(f'To continue, delete the previous request: {pickle_file}')
+
+    state = cds_request.reply['state']
+
+    if state == 'completed':
+        message('Request finished, downloading NetCDF file')
+
+        # Download to a temporary file, and only move it to its final location once
+        # the download is complete, so an interrupted download can't be mistaken for
+        # a local ERA5/CAMS file.
+        part_file = f'{nc_file}.part'
+        cds_request.download(part_file)
+        os.replace(part_file, nc_file)
+
+        # Patch NetCDF file, to make the (+/-) identical to the old CDS
+        # files, and files retrieved from MARS.
+        patch_netcdf(nc_file)
+
+        os.remove(pickle_file)
+
+        return True
+
+    elif state in ('queued', 'accepted', 'running'):
+        message(f'Request not finished, current status = \"{state}\"')
+
+    else:
+        error(f'Request failed, status = \"{state}\"', exit=False)
+        message(f'Error message = {cds_request.reply["error"].get("message")}')
+        message(f'Error reason = {cds_request.reply["error"].get("reason")}')
+
+    return False
+
+
 def get_required_analysis(start, end, freq=1):
 
     # One day datetime offset
@@ -103,8 +103,11 @@ def patch_netcdf(nc_file_path):
         for attr in to_rm:
             del da.attrs[attr]
 
-    # Overwrite old file.
-    new_ds.to_netcdf(nc_file_path, format='NETCDF4_CLASSIC')
+    # Overwrite old file. Write to a temporary file first, so that
+    # an interrupted write does not leave a corrupt NetCDF file behind.
+    part_file_path = f'{nc_file_path}.part'
+    new_ds.to_netcdf(part_file_path, format='NETCDF4_CLASSIC')
+    os.replace(part_file_path, nc_file_path)
 
     return new_ds   # Just for debugging...
 
@@ -26,11 +26,11 @@ import sys, os
 import xarray as xr
 import pandas as pd
 import numpy as np
-from scipy import interpolate
 
 # LS2D modules
 from ls2d.src.messages import *
 import ls2d.src.spatial_tools as spatial
+from ls2d.src.interp_tools import interp_extrapolate, nearest_index
 import ls2d.ecmwf.era_tools as era_tools
 from ls2d.ecmwf.IFS_tools import IFS_tools
 from ls2d.ecmwf.patch_cds_ads import patch_netcdf
@@ -119,14 +119,8 @@ class Read_cams:
         # Short-cut
         ds = self.ds_ml
 
-        dims = self.ds_ml.dims
         dim_name = ['time', 'level', 'latitude', 'longitude']
 
-        ntime = dims['time']
-        nlevel = dims['level']
-        nlon = dims['longitude']
-        nlat = dims['latitude']
-
         # Help class for vertical grid calculations IFS.
         ifs_tools = IFS_tools('L60')
 
@@ -134,15 +128,11 @@ class Read_cams:
         Tv = ifs_tools.calc_virtual_temp(ds.t.values, ds.q.values)
 
         # Calculate half level pressure and height.
-        dim_size_h = [ntime, nlevel+1, nlat, nlon]
-        ph = np.zeros(dim_size_h, np.float32)
-        zh = np.zeros(dim_size_h, np.float32)
+        ph = ifs_tools.calc_half_level_pressure(ds.sp.values.astype(np.float64))
+        zh = ifs_tools.calc_half_level_Zg(ph, Tv)
 
-        for t in range(ntime):
-            for j in range(nlat):
-                for i in range(nlon):
-                    ph[t,:,j,i] = ifs_tools.calc_half_level_pressure(float(ds.sp[t,j,i]))
-                    zh[t,:,j,i] = ifs_tools.calc_half_level_Zg(ph[t,:,j,i], Tv[t,:,j,i])
+        ph = ph.astype(np.float32)
+        zh = zh.astype(np.float32)
 
         # Full level pressure and height as interpolation of the half level values
         p = 0.5 * (ph[:,1:,:,:] + ph[:,:-1:,:])
@@ -163,8 +153,8 @@ class Read_cams:
         clon = self.settings['central_lon']
         clat = self.settings['central_lat']
     
-        ic = int(np.abs(self.ds_ml.longitude - clon).argmin())
-        jc = int(np.abs(self.ds_ml.latitude  - clat).argmin())
+        ic = nearest_index(self.ds_ml.longitude.values, clon)
+        jc = nearest_index(self.ds_ml.latitude.values,  clat)
     
         # Some debugging output
         distance = spatial.haversine(self.ds_ml.longitude[ic], self.ds_ml.latitude[jc], clon, clat)
@@ -220,8 +210,7 @@ class Read_cams:
                     out = np.empty((ntime, ktot), np.float32)
     
                     for t in range(ntime):
-                        out[t,:] = interpolate.interp1d(
-                                self.ds_ml_mean['z'][t,:].values, da[t,:].values, fill_value='extrapolate')(z)
+                        out[t,:] = interp_extrapolate(self.ds_ml_mean['z'][t,:].values, da[t,:].values, z)
     
                     self.ds_les[name] = (dims_les, out)
 
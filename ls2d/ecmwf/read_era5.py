@@ -26,11 +26,11 @@ import sys, os
 import netCDF4 as nc4
 import xarray as xr
 import numpy as np
-from scipy import interpolate
 
 # LS2D modules
 import ls2d.src.spatial_tools as spatial
 import ls2d.src.finite_difference as fd
+from ls2d.src.interp_tools import interp_extrapolate, nearest_index
 from ls2d.src.messages import *
 
 import ls2d.ecmwf.era_tools as era_tools
@@ -57,6 +57,53 @@ class Slice:
         return np.s_[:,:,self.jstart+dj:self.jend+dj,\
                          self.istart+di:self.iend+di]
 
+class _Multi_variable:
+    def __init__(self, parent, name):
+        self.parent = parent
+        self.name = name
+
+    def __getitem__(self, index):
+        """
+        Read variable, concatenating the data from all files over the
+        time dimension. The time dimension has to be indexed with a slice.
+        """
+        files = self.parent.files
+        if 'time' not in files[0].variables[self.name].dimensions:
+            data = [files[0].variables[self.name][index]]
+        else:
+            index = index if isinstance(index, tuple) else (index,)
+            start, stop, step = index[0].indices(self.parent.offsets[-1])
+
+            data = []
+            for f, t0, t1 in zip(files, self.parent.offsets[:-1], self.parent.offsets[1:]):
+                if start < t1 and stop > t0:
+                    local = np.s_[max(start, t0)-t0 : min(stop, t1)-t0]
+                    data.append(f.variables[self.name][(local,) + index[1:]])
+
+        data = data[0] if len(data) == 1 else np.ma.concatenate(data)
+
+        # Like `MFDataset`, only return a masked array if there are masked values.
+        return data if np.ma.is_masked(data) else np.ma.getdata(data)
+
+
+class Multi_netcdf:
+    """
+    Aggregate NetCDF files over the time dimension, similar to `nc4.MFDataset`,
+    but reading directly from the individual `nc4.Dataset`'s, which is much faster.
+    """
+    def __init__(self, files):
+        self.files = [nc4.Dataset(f, 'r') for f in files]
+        self.dimensions = self.files[0].dimensions
+        self.variables = {name: _Multi_variable(self, name) for name in self.files[0].variables}
+
+        # Start index of each file in the aggregated time dimension.
+        self.offsets = np.cumsum([0] + [f.dimensions['time'].size for f in self.files])
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
 class Read_era5:
     """
     Read the ERA5 model/pressure/surface level data,
@@ -129,10 +176,10 @@ class Read_era5:
                 ds.close()
                 patch_netcdf(f)
 
-        # Open NetCDF files: MFDataset automatically merges the files / time dimensions
-        self.fsa = nc4.MFDataset(an_sfc_files,   aggdim='time')
-        self.fma = nc4.MFDataset(an_model_files, aggdim='time')
-        self.fpa = nc4.MFDataset(an_pres_files,  aggdim='time')
+        # Open NetCDF files: Multi_netcdf merges the files / time dimensions
+        self.fsa = Multi_netcdf(an_sfc_files  )
+        self.fma = Multi_netcdf(an_model_files)
+        self.fpa = Multi_netcdf(an_pres_files )
 
 
     def read_data(self):
@@ -140,34 +187,21 @@ class Read_era5:
         Read all the required variables from the NetCDF files
         """
 
-        def flip(array):
-            """
-            Flip the height and/or latitude dimensions
-            """
-            if len(array.shape) == 4:
-                # Reverse order of 4-dimensional field (time, height, lat, lon)
-                # in height (axis=1) and lat (axis=2) direction
-                return np.flip(np.flip(array, axis=1), axis=2)
-            elif len(array.shape) == 3:
-                # Reverse order of 3-dimensional field (time, lat, lon)
-                # in lat (axis=1) direction
-                return np.flip(array, axis=1)
-            elif len(array.shape) == 1:
-                # Reverse order of 1-dimensional field (height)
-                return np.flip(array, axis=0)
-
-
-        def get_variable(nc, var, dslice, wrap_func=None, dtype=None):
+        def get_variable(nc, var, dslice, wrap_func=None, dtype=np.float32):
             """
             Read NetCDF variable, and flip height and latitude dimensions.
-            Optionally, apply the `wrap_func` function on the data,
-            and/or cast data to requested `dtype`.
+            `dslice` is a tuple with the NetCDF read slice, and the (negative-stride,
+            so no data is copied) slice which flips the height/latitude dimensions.
+            Optionally, apply the `wrap_func` function (a NumPy ufunc) on the data.
+            The data is cast to `dtype`, by default single precision;
+            ERA5 is stored packed as 16-bit integers, so this loses no information.
             """
-            data = flip(nc.variables[var][dslice])
-            # Apply wrapper function (if provided):
-            data = wrap_func(data) if wrap_func is not None else data
-            # Cast to requested data type (if provided):
-            data = data.astype(dtype) if dtype is not None else data
+            read_slice, flip_slice = dslice
+            data = nc.variables[var][read_slice][flip_slice]
+            # Apply wrapper function (if provided), in-place on the (flipped view of the) data:
+            data = wrap_func(data, out=data) if wrap_func is not None else data
+            # Cast to requested data type:
+            data = data.astype(dtype, copy=False)
 
             return data
 
@@ -181,47 +215,64 @@ class Read_era5:
         start_h_since = (self.start - date_00).total_seconds()/3600.
         end_h_since   = (self.end   - date_00).total_seconds()/3600.
 
-        t0_an = np.abs(an_time_tmp - start_h_since).argmin()
-        t1_an = np.abs(an_time_tmp - end_h_since  ).argmin()
+        t0_an = nearest_index(an_time_tmp, start_h_since)
+        t1_an = nearest_index(an_time_tmp, end_h_since  )
 
         # Time slices
         t_an = np.s_[t0_an:t1_an+1]
 
         # Read spatial and time variables
-        self.lats = self.fma.variables['latitude'][::-1]
-        self.lons = self.fma.variables['longitude'][:]
+        lats = self.fma.variables['latitude'][:].astype(np.float64)
+        lons = self.fma.variables['longitude'][:].astype(np.float64)
+
+        # Shift grid from 0-360 to -180, 180 (if needed)
+        if np.any(lons>180):
+            lons = -360+lons
+
+        # Only read the area within `area_size` degrees of the requested location. The NetCDF
+        # files can cover a larger area, e.g. when they are re-used for a smaller domain.
+        # The tolerance of half a grid spacing makes sure that the edges of the downloaded
+        # area (at `center +/- area_size`, up to float32 rounding of the coordinates) are never dropped.
+        def get_window(coords, center):
+            tolerance = 0.5 * np.abs(coords[1] - coords[0]) if coords.size > 1 else 0
+            index = np.nonzero(np.abs(coords - center) <= self.settings['area_size'] + tolerance)[0]
+            if index.size == 0:
+                error('Requested location is outside the domain of the ERA5 files!')
+            return np.s_[index[0]:index[-1]+1]
+
+        sj = get_window(lats, self.settings['central_lat'])
+        si = get_window(lons, self.settings['central_lon'])
+
+        self.lats = lats[sj][::-1]
+        self.lons = lons[si]
 
         # Read time, and check if all files are synced.
         self.time = self.fma.variables['time'][t_an]
         time_check = self.fsa.variables['time'][t_an]
 
-        if not np.all(self.time == time_check):
+        if not np.array_equal(self.time, time_check):
             warning('Model level times: {}'.format(self.time))
             warning('Surface times:     {}'.format(time_check))
             error('Model level and surface times are not synced!')
 
-        # Shift grid from 0-360 to -180, 180 (if needed)
-        if np.any(self.lons>180):
-            self.lons = -360+self.lons
-
         self.time_sec = (self.time-self.time[0])*3600.
 
         # Time in datetime format
-        self.datetime = [datetime.datetime(1900, 1, 1) + datetime.timedelta(hours=int(h)) for h in self.time]
+        self.datetime = np.datetime64('1900-01-01T00:00:00', 'ns') + \
+                self.time.astype(np.int64).astype('timedelta64[h]')
 
         # Grid and time dimensions
         self.nfull = self.fma.dimensions['level'].size
         self.nhalf = self.nfull+1
-        self.nlat  = self.fma.dimensions['latitude'].size
-        self.nlon  = self.fma.dimensions['longitude'].size
+        self.nlat  = self.lats.size
+        self.nlon  = self.lons.size
         self.ntime = self.time.size
 
         # Read the full fields, reversing (flip) the height axis from top-to-bottom
         # to bottom-to-top, and reversing the latitude dimension
-        s1d  = np.s_[:         ]    # Slice for 1D fields
-        s2d  = np.s_[t_an,:,:  ]    # Slice for 2D (surface) fields
-        s3d  = np.s_[t_an,:,:,:]    # Slice for 3D (atmospheric) fields
-        s3ds = np.s_[t_an,0,:,:]    # Slice for surface plane of 3D field
+        s1d  = (np.s_[:            ], np.s_[::-1         ])    # Slices for 1D (height) fields
+        s2d  = (np.s_[t_an,  sj,si], np.s_[:,    ::-1,:])    # Slices for 2D (surface) fields
+        s3d  = (np.s_[t_an,:,sj,si], np.s_[:,::-1,::-1,:])    # Slices for 3D (atmospheric) fields
 
         # Model level analysis data:
         self.u  = get_variable(self.fma, 'u',    s3d)  # v-component wind (m s-1)
@@ -233,27 +284,12 @@ class Read_era5:
         self.qi = get_variable(self.fma, 'ciwc', s3d)  # Specific cloud ice content (kg kg-1)
         self.qr = get_variable(self.fma, 'crwc', s3d)  # Specific rain water content (kg kg-1)
         self.qs = get_variable(self.fma, 'cswc', s3d)  # Specific snow content (kg kg-1)
-        self.o3 = get_variable(self.fma, 'o3',   s3d)  # Ozone (kg kg-1)
 
         # Surface variables:
-        self.sst =  get_variable(self.fsa, 'sst',  s2d)  # Sea surface temperature (K)
         self.Ts  =  get_variable(self.fsa, 'skt',  s2d)  # Skin temperature (K)
         self.H   = -get_variable(self.fsa, 'ishf', s2d)  # Surface sensible heat flux (W m-2)
-        self.wqs = -get_variable(self.fsa, 'ie',   s2d)  # Surface kinematic moisture flux (g kg-1)
-        self.z0m =  get_variable(self.fsa, 'fsr',  s2d)  # Surface roughness length (m)
-        self.z0h =  get_variable(self.fsa, 'flsr', s2d, np.exp)  # Surface roughness length heat (m)
         self.ps  =  get_variable(self.fsa, 'sp',   s2d)  # Surface pressure (Pa)
 
-        self.soil_type     = get_variable(self.fsa, 'slt', s2d, np.round, np.int32)  # Soil type (-)
-        self.veg_type_low  = get_variable(self.fsa, 'tvl', s2d, np.round, np.int32)  # Low vegetation type (-)
-        self.veg_type_high = get_variable(self.fsa, 'tvh', s2d, np.round, np.int32)  # High vegetation type (-)
-
-        self.lai_low  = get_variable(self.fsa, 'lai_lv', s2d)  # LAI low veg (-)
-        self.lai_high = get_variable(self.fsa, 'lai_hv', s2d)  # LAI high veg (-)
-
-        self.cveg_low  = get_variable(self.fsa, 'cvl', s2d)  # Low vegetation cover (-)
-        self.cveg_high = get_variable(self.fsa, 'cvh', s2d)  # High vegetation cover (-)
-
         # Soil variables:
         self.T_soil1 = get_variable(self.fsa, 'stl1', s2d)  # Top soil layer temperature (K)
         self.T_soil2 = get_variable(self.fsa, 'stl2', s2d)  # 2nd soil layer temperature (K)
@@ -265,12 +301,47 @@ class Read_era5:
         self.theta_soil3 = get_variable(self.fsa, 'swvl3', s2d)  # 3rd soil layer moisture (-)
         self.theta_soil4 = get_variable(self.fsa, 'swvl4', s2d)  # Bottom soil layer moistsure (-)
 
-        # Pressure level data:
-        self.z_p = get_variable(self.fpa, 'z', s3d) / ifs_tools.grav  # Geopotential height on pressure levels (m)
-        self.p_p = get_variable(self.fpa, 'level', s1d) * 100         # Pressure levels (Pa)
+        # Pressure levels:
+        self.p_p = get_variable(self.fpa, 'level', s1d, dtype=np.float64) * 100  # Pressure levels (Pa)
+
+        # Variables which are not needed to calculate the derived properties are only read
+        # when they are first accessed (see `__getattr__`), e.g. by `calculate_forcings()`.
+        self._lazy_variables = {
+            # Model level analysis data. Ozone is converted from mass mixing ratio to volume mixing ratio.
+            'o3': lambda: 28.9644 / 47.9982 * get_variable(self.fma, 'o3', s3d) * 1e6,  # Ozone (ppmv)
+
+            # Surface variables:
+            'sst': lambda:  get_variable(self.fsa, 'sst',  s2d),  # Sea surface temperature (K)
+            'wqs': lambda: -get_variable(self.fsa, 'ie',   s2d),  # Surface kinematic moisture flux (g kg-1)
+            'z0m': lambda:  get_variable(self.fsa, 'fsr',  s2d),  # Surface roughness length (m)
+            'z0h': lambda:  get_variable(self.fsa, 'flsr', s2d, np.exp),  # Surface roughness length heat (m)
+
+            'soil_type':     lambda: get_variable(self.fsa, 'slt', s2d, np.round, np.int32),  # Soil type (-)
+            'veg_type_low':  lambda: get_variable(self.fsa, 'tvl', s2d, np.round, np.int32),  # Low vegetation type (-)
+            'veg_type_high': lambda: get_variable(self.fsa, 'tvh', s2d, np.round, np.int32),  # High vegetation type (-)
+
+            'lai_low':  lambda: get_variable(self.fsa, 'lai_lv', s2d),  # LAI low veg (-)
+            'lai_high': lambda: get_variable(self.fsa, 'lai_hv', s2d),  # LAI high veg (-)
+
+            'cveg_low':  lambda: get_variable(self.fsa, 'cvl', s2d),  # Low vegetation cover (-)
+            'cveg_high': lambda: get_variable(self.fsa, 'cvh', s2d),  # High vegetation cover (-)
+
+            # Pressure level data:
+            'z_p': lambda: get_variable(self.fpa, 'z', s3d) / ifs_tools.grav}  # Geopotential height on pressure levels (m)
+
+
+    def __getattr__(self, name):
+        """
+        Read variables from `_lazy_variables` on first access.
+        Only called if `name` is not (yet) an attribute of the class.
+        """
+        lazy_variables = self.__dict__.get('_lazy_variables', {})
+        if name not in lazy_variables:
+            raise AttributeError(f'\'{type(self).__name__}\' object has no attribute \'{name}\'')
 
-        # Convert ozone from mass mixing ratio to volume mixing ratio
-        self.o3 = 28.9644 / 47.9982 * self.o3 * 1e6
+        data = lazy_variables.pop(name)()
+        setattr(self, name, data)
+        return data
 
 
     def calc_derived_data(self):
@@ -279,33 +350,43 @@ class Read_era5:
         prognostic variables used by LES, etc.
         """
 
-        self.ql  = self.qc + self.qi + self.qr + self.qs  # Total liquid/solid specific humidity (kg kg-1)
+        self.ql  = self.qc + self.qi  # Total liquid/solid specific humidity (kg kg-1)
+        self.ql += self.qr
+        self.ql += self.qs
         self.qt  = self.q + self.ql                       # Total specific humidity (kg kg-1)
         self.Tv  = ifs_tools.calc_virtual_temp(
                 self.T, self.q, self.qc, self.qi, self.qr, self.qs)  # Virtual temp on full levels (K)
 
-        # Calculate half level pressure and heights
-        self.ph  = np.zeros((self.ntime, self.nhalf, self.nlat, self.nlon))  # Half level pressure (Pa)
-        self.zh  = np.zeros((self.ntime, self.nhalf, self.nlat, self.nlon))  # Half level geopotential height (m)
-
-        # TO-DO: remove loops
-        for t in range(self.ntime):
-            for la in range(self.nlat):
-                for lo in range(self.nlon):
-                    self.ph[t,:,la,lo] = ifs_tools.calc_half_level_pressure(self.ps[t,la,lo])
-                    self.zh[t,:,la,lo] = ifs_tools.calc_half_level_Zg(self.ph[t,:,la,lo], self.Tv[t,:,la,lo])
+        # Calculate half level pressure and heights. The vertical integration
+        # is done in double precision, the results are stored in single precision.
+        ph = ifs_tools.calc_half_level_pressure(self.ps.astype(np.float64))
+        zh = ifs_tools.calc_half_level_Zg(ph, self.Tv)
 
         # Full level pressure and height as interpolation of the half level values
-        self.p  = 0.5 * (self.ph[:,1:,:,:] + self.ph[:,:-1:,:])  # Full level pressure (Pa)
-        self.z  = 0.5 * (self.zh[:,1:,:,:] + self.zh[:,:-1:,:])  # Full level height (m)
+        self.p  = (0.5 * (ph[:,1:,:,:] + ph[:,:-1:,:])).astype(np.float32)  # Full level pressure (Pa)
+        self.z  = (0.5 * (zh[:,1:,:,:] + zh[:,:-1:,:])).astype(np.float32)  # Full level height (m)
+
+        self.ph = ph.astype(np.float32)  # Half level pressure (Pa)
+        self.zh = zh.astype(np.float32)  # Half level geopotential height (m)
 
-        # Other derived quantities
+        # Other derived quantities. Where possible, the operations are done in-place,
+        # to prevent (time, level, lat, lon) sized temporary arrays.
         self.exn  = ifs_tools.calc_exner(self.p)  # Exner on full model levels (-)
-        self.th   = (self.T / self.exn)  # Potential temperature (K)
-        self.thl  = self.th - ifs_tools.Lv / (ifs_tools.cpd * self.exn) * self.ql  # Liquid water potential temperature (K)
-        self.rho  = self.p / (ifs_tools.Rd * self.Tv)  # Density at full levels (kg m-3)
-        self.wls  = -self.w / (self.rho * ifs_tools.grav)  # Vertical velocity (m s-1)
-        self.U    = (self.u**2. + self.v**2)**0.5  # Absolute horizontal wind (m s-1)
+        inv_exn   = np.reciprocal(self.exn)
+
+        self.th   = self.T * inv_exn  # Potential temperature (K)
+
+        self.thl  = self.ql * inv_exn  # Liquid water potential temperature (K)
+        self.thl *= -ifs_tools.Lv / ifs_tools.cpd
+        self.thl += self.th
+
+        self.rho  = self.p / self.Tv  # Density at full levels (kg m-3)
+        self.rho *= 1 / ifs_tools.Rd
+
+        self.wls  = self.w / self.rho  # Vertical velocity (m s-1)
+        self.wls *= -1 / ifs_tools.grav
+
+        self.U    = np.hypot(self.u, self.v)  # Absolute horizontal wind (m s-1)
 
         self.Tvs  = ifs_tools.calc_virtual_temp(self.Ts, self.q[:,0])  # Estimate surface Tv using lowest model q (...)
         self.rhos = self.ph[:,0] / (ifs_tools.Rd * self.Tvs)  # Surface density (kg m-3)
@@ -316,8 +397,8 @@ class Read_era5:
 
         # Store soil temperature, and moisture content, in 3D array
         self.z_soil = np.array([-0.035, -0.175, -0.64, -1.945])
-        self.T_soil = np.zeros((self.ntime, 4, self.nlat, self.nlon))
-        self.theta_soil = np.zeros((self.ntime, 4, self.nlat, self.nlon))
+        self.T_soil = np.zeros((self.ntime, 4, self.nlat, self.nlon), np.float32)
+        self.theta_soil = np.zeros((self.ntime, 4, self.nlat, self.nlon), np.float32)
 
         self.T_soil[:,0,:,:] = self.T_soil1[:,:,:]
         self.T_soil[:,1,:,:] = self.T_soil2[:,:,:]
@@ -333,12 +414,32 @@ class Read_era5:
     def calculate_forcings(self, n_av=0, method='4th'):
         """
         Calculate the advective tendencies, geostrophic wind, et cetera.
+
+        The ERA5 fields are not modified; only the `*_mean` profiles, tendencies,
+        and geostrophic wind are (re)set. To compare e.g. the `2nd` and `4th` order
+        methods, there is no need to (deep)copy the `Read_era5` object: call
+        `calculate_forcings()` and `get_les_input()` once per method on the same object.
+
+        Arguments:
+            n_av : int, optional (default = 0)
+                Number of grid points (+/-) used for spatial averaging
+            method : string, optional (default = '4th')
+                Method used for spatial gradients (in: [2nd, 4th])
         """
         header('Calculating large-scale forcings')
 
         # Find nearest location on (regular lat/lon) grid
-        self.i = np.abs(self.lons - self.settings['central_lon']).argmin()
-        self.j = np.abs(self.lats - self.settings['central_lat']).argmin()
+        self.i = nearest_index(self.lons, self.settings['central_lon'])
+        self.j = nearest_index(self.lats, self.settings['central_lat'])
+
+        # The averaging domain plus the stencil should fit in the domain read from the NetCDF files.
+        # Negative indices would silently wrap around to the other side of the domain. The 4th order
+        # method needs two extra points; the 2nd order method only needs j+/-1 and i+/-1 for the grid
+        # spacing, as `np.gradient` falls back to one-sided differences at the domain edges.
+        n_stencil = n_av + 2 if method == '4th' else max(n_av, 1)
+        if self.j - n_stencil < 0 or self.j + n_stencil >= self.nlat or \
+           self.i - n_stencil < 0 or self.i + n_stencil >= self.nlon:
+            error('Averaging domain (n_av={}) plus stencil does not fit in the ERA5 domain, increase `area_size`!'.format(n_av))
 
         # Some debugging output
         distance = spatial.haversine(
@@ -365,6 +466,8 @@ class Read_era5:
         center4d = np.s_[:,:,jstart:jend,istart:iend]
         center3d = np.s_[:,  jstart:jend,istart:iend]
 
+        # NOTE: the means are calculated per variable. Stacking the (sub-domain) slices to
+        # average all variables with a single reduction copies the slices, which is slower.
         # Variables averaged from (time, height, lon, lat) to (time, height):
         var_4d_mean = [
                 'z', 'zh', 'p', 'ph', 'T', 'thl', 'qt', 'qc', 'qi',
@@ -376,7 +479,7 @@ class Read_era5:
 
         # Variables averaged from (time, lon, lat) to (time):
         var_3d_mean = [
-                'ps', 'Ts', 'sst', 'wths', 'wqs', 'ps', 'rhos',
+                'ps', 'Ts', 'sst', 'wths', 'wqs', 'rhos',
                 'lai_low', 'lai_high', 'z0m', 'z0h', 'cveg_low', 'cveg_high']
         for var in var_3d_mean:
             mean = getattr(self, var)[center3d].mean(axis=(1,2))
@@ -428,11 +531,24 @@ class Read_era5:
             dxdi[:,:] = r_earth * cos_lat[:,None]*np.gradient(lon_rad[None, :], axis=1)
             dydj[:,:] = r_earth * np.gradient(lat_rad[:, None], axis=0)
 
+            # Multiply with the (2D) reciprocal grid spacing, instead of dividing the 4D gradients.
+            didx = 1. / dxdi
+            djdy = 1. / dydj
+
+            # The advective tendencies are only needed in the averaging domain. Calculate the
+            # gradients over the averaging domain plus a one grid point halo (limited to the
+            # domain bounds), which gives the same central/one-sided differences as over the full domain.
+            j0 = max(jstart-1, 0)
+            i0 = max(istart-1, 0)
+            halo2d = np.s_[j0:jend+1, i0:iend+1]
+            halo4d = np.s_[:,:,j0:jend+1, i0:iend+1]
+            inner  = np.s_[:,:,jstart-j0:jend-j0, istart-i0:iend-i0]
+
             def advec(var):
-                dvardx = np.gradient(var, axis=3) / dxdi[None, None, :, :]
-                dvardy = np.gradient(var, axis=2) / dydj[None, None, :, :]
-                dtvar  = -self.u * dvardx - self.v * dvardy
-                return dtvar[center4d].mean(axis=(2,3))
+                dvardx = np.gradient(var[halo4d], axis=3) * didx[halo2d][None, None, :, :]
+                dvardy = np.gradient(var[halo4d], axis=2) * djdy[halo2d][None, None, :, :]
+                dtvar  = -self.u[halo4d] * dvardx - self.v[halo4d] * dvardy
+                return dtvar[inner].mean(axis=(2,3))
 
             # Calculate advective tendencies:
             self.dtthl_advec_mean = advec(self.thl)
@@ -441,8 +557,8 @@ class Read_era5:
             self.dtv_advec_mean   = advec(self.v)
 
             # Geostrophic wind:
-            dzdx = np.gradient(self.z_p, axis=3) / dxdi[None, None, :, :]
-            dzdy = np.gradient(self.z_p, axis=2) / dydj[None, None, :, :]
+            dzdx = np.gradient(self.z_p, axis=3) * didx[None, None, :, :]
+            dzdy = np.gradient(self.z_p, axis=2) * djdy[None, None, :, :]
 
             self.ug_p = -ifs_tools.grav / self.fc * dzdy
             self.vg_p =  ifs_tools.grav / self.fc * dzdx
@@ -451,51 +567,34 @@ class Read_era5:
             vg_p_mean = self.vg_p[center4d].mean(axis=(2,3))
 
             # Bonus for large domains; spatial (ug,vg) on model levels.
-            # Use Scipy's interpolation, as it can extrapolate (in case ps > 1000 hPa)
-            self.ug = np.zeros_like(self.u)
-            self.vg = np.zeros_like(self.u)
-
-            for t in range(self.ntime):
-                for j in range(self.nlat):
-                    for i in range(self.nlon):
-                        self.ug[t,:,j,i] = interpolate.interp1d(
-                            self.p_p, self.ug_p[t,:,j,i], fill_value='extrapolate')(self.p[t,:,j,i])
-                        self.vg[t,:,j,i] = interpolate.interp1d(
-                            self.p_p, self.vg_p[t,:,j,i], fill_value='extrapolate')(self.p[t,:,j,i])
+            # Use linear extrapolation in case ps > 1000 hPa.
+            self.ug = interp_extrapolate(self.p_p, self.ug_p, self.p, axis=1).astype(self.u.dtype)
+            self.vg = interp_extrapolate(self.p_p, self.vg_p, self.p, axis=1).astype(self.u.dtype)
 
 
         elif (method == '4th'):
 
             s = Slice(istart, iend, jstart, jend)
 
+            # Wind in averaging domain
+            u = self.u[s(0,0)]
+            v = self.v[s(0,0)]
+
+            def advec(var):
+                """
+                Advective tendency -u*dvar/dx - v*dvar/dy, averaged over averaging domain.
+                The tendency is accumulated in-place, to prevent temporary arrays.
+                """
+                dtvar  = fd.grad4c(var[s(0,-2)], var[s(0,-1)], var[s(0,+1)], var[s(0,+2)], dx)
+                dtvar *= u
+                dtvar += v * fd.grad4c(var[s(-2,0)], var[s(-1,0)], var[s(+1,0)], var[s(+2,0)], dy)
+                return -dtvar.mean(axis=(2,3))
+
             # Calculate advective tendencies
-            self.dtthl_advec_mean = (
-                -self.u[s(0,0)] * fd.grad4c(
-                    self.thl[s(0,-2)], self.thl[s(0,-1)], self.thl[s(0,+1)], self.thl[s(0,+2)], dx) \
-                -self.v[s(0,0)] * fd.grad4c(
-                    self.thl[s(-2,0)], self.thl[s(-1,0)], self.thl[s(+1,0)], self.thl[s(+2,0)], dy)
-                                    ).mean(axis=(2,3))
-
-            self.dtqt_advec_mean =  (
-                -self.u[s(0,0)] * fd.grad4c(
-                    self.qt[s(0,-2)], self.qt[s(0,-1)], self.qt[s(0,+1)], self.qt[s(0,+2)], dx) \
-                -self.v[s(0,0)] * fd.grad4c(
-                    self.qt[s(-2,0)], self.qt[s(-1,0)], self.qt[s(+1,0)], self.qt[s(+2,0)], dy)
-                                    ).mean(axis=(2,3))
-
-            self.dtu_advec_mean = (
-                -self.u[s(0,0)] * fd.grad4c(
-                    self.u[s(0,-2)], self.u[s(0,-1)], self.u[s(0,+1)], self.u[s(0,+2)], dx) \
-                -self.v[s(0,0)] * fd.grad4c(
-                    self.u[s(-2,0)], self.u[s(-1,0)], self.u[s(+1,0)], self.u[s(+2,0)], dy)
-                                  ).mean(axis=(2,3))
-
-            self.dtv_advec_mean = (
-                -self.u[s(0,0)] * fd.grad4c(
-                    self.v[s(0,-2)], self.v[s(0,-1)], self.v[s(0,+1)], self.v[s(0,+2)], dx) \
-                -self.v[s(0,0)] * fd.grad4c(
-                    self.v[s(-2,0)], self.v[s(-1,0)], self.v[s(+1,0)], self.v[s(+2,0)], dy)
-                                  ).mean(axis=(2,3))
+            self.dtthl_advec_mean = advec(self.thl)
+            self.dtqt_advec_mean  = advec(self.qt)
+            self.dtu_advec_mean   = advec(self.u)
+            self.dtv_advec_mean   = advec(self.v)
 
             # Geostrophic wind (gradient geopotential height on constant pressure levels)
             vg_p_mean = (
@@ -509,15 +608,9 @@ class Read_era5:
 
 
         # Interpolate geostrophic wind onto model grid.
-        # Use Scipy's interpolation, as it can extrapolate (in case ps > 1000 hPa)
-        self.ug_mean = np.zeros_like(self.p_mean)
-        self.vg_mean = np.zeros_like(self.p_mean)
-
-        for t in range(self.ntime):
-            self.ug_mean[t,:] = interpolate.interp1d(
-                    self.p_p, ug_p_mean[t,:], fill_value='extrapolate')(self.p_mean[t,:])
-            self.vg_mean[t,:] = interpolate.interp1d(
-                    self.p_p, vg_p_mean[t,:], fill_value='extrapolate')(self.p_mean[t,:])
+        # Use linear extrapolation in case ps > 1000 hPa.
+        self.ug_mean = interp_extrapolate(self.p_p, ug_p_mean, self.p_mean)
+        self.vg_mean = interp_extrapolate(self.p_p, vg_p_mean, self.p_mean)
 
         # Momentum tendency coriolis
         self.dtu_coriolis_mean = +self.fc * (self.v_mean - self.vg_mean)
@@ -684,3 +777,51 @@ class Read_era5:
         ds.attrs['reference'] = 'van Stratum et al. (2023). The benefits and challenges of downscaling a global reanalysis with doubly-periodic large-eddy simulations. JAMES, https://doi.org/10.1029/2023MS003750'
 
         return ds
+
+
+def get_les_input_chunked(settings, z, n_av=0, method='4th', chunk_hours=24):
+    """
+    Read ERA5, calculate the forcings, and return the LES input, like
+    `Read_era5(settings)` + `calculate_forcings()` + `get_les_input()`, but processed
+    in time chunks of `chunk_hours`. Only the ERA5 fields of a single chunk are kept in memory,
+    which strongly reduces the memory usage for long (multi-week) experiments.
+
+    Arguments:
+        settings : dictionary
+            LS2D settings, as passed to `Read_era5`
+        z : np.ndarray
+            LES full level heights (m)
+        n_av : int, optional (default = 0)
+            Number of grid points (+/-) used for spatial averaging, see `calculate_forcings()`
+        method : string, optional (default = '4th')
+            Method used for spatial gradients, see `calculate_forcings()`
+        chunk_hours : int, optional (default = 24)
+            Number of hours (ERA5 time steps) per chunk
+    """
+
+    start = settings['start_date']
+    end   = settings['end_date']
+
+    datasets = []
+    while start <= end:
+        chunk_end = min(start + datetime.timedelta(hours=chunk_hours-1), end)
+
+        settings_chunk = settings.copy()
+        settings_chunk.update({'start_date': start, 'end_date': chunk_end})
+
+        era = Read_era5(settings_chunk)
+        era.calculate_forcings(n_av=n_av, method=method)
+        datasets.append(era.get_les_input(z))
+        del era
+
+        start = chunk_end + datetime.timedelta(hours=1)
+
+    # Merge chunks; variables without time dimension (soil/vegetation types, ..) are taken from the first chunk.
+    ds = xr.concat(datasets, dim='time', data_vars='minimal', coords='minimal',
+                   compat='override', combine_attrs='override')
+
+    # Time since start of experiment has to be recalculated over the merged time dimension.
+    time_sec = (ds.time.values - ds.time.values[0]) / np.timedelta64(1, 's')
+    ds['time_sec'] = ds['time_sec'].copy(data=time_sec)
+
+    return ds
@@ -28,7 +28,7 @@ def grad2(a, b, delta):
          [X]
     """
 
-    return (b - a) / delta
+    return (b - a) * (1. / delta)
 
 def grad2c(a, b, delta):
     """
@@ -40,7 +40,7 @@ def grad2c(a, b, delta):
             [X]
     """
 
-    return (b - a) / (2*delta)
+    return (b - a) * (1. / (2*delta))
 
 def grad4(a, b, c, d, delta):
     """
@@ -52,7 +52,7 @@ def grad4(a, b, c, d, delta):
                [X]
     """
 
-    return (a - 27*b + 27*c - d) / (24*delta)
+    return (a - 27*b + 27*c - d) * (1. / (24*delta))
 
 def grad4c(a, b, c, d, delta):
     """
@@ -64,4 +64,4 @@ def grad4c(a, b, c, d, delta):
                   [X]
     """
 
-    return (a - 8*b + 8*c - d) / (12*delta)
+    return (a - 8*b + 8*c - d) * (1. / (12*delta))
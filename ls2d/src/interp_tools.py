@@ -0,0 +1,75 @@
+#
+# This file is part of LS2D.
+#
+# Copyright (c) 2017-2024 Wageningen University & Research
+# Author: Bart van Stratum (WUR)
+#
+# LS2D is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LS2D is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with LS2D.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import numpy as np
+
+def interp_extrapolate(xp, fp, x, axis=-1):
+    """
+    Vectorised linear interpolation of `fp(xp)` onto `x`, with linear extrapolation
+    outside the range of `xp`, like Scipy's `interp1d(xp, fp, fill_value='extrapolate')`,
+    but for all columns at once.
+
+    Arguments:
+        xp : 1D array with monotonic (increasing or decreasing) coordinates
+        fp : array with values, with size `xp.size` in dimension `axis`
+        x : array with coordinates to interpolate to, with the same shape as `fp`,
+            except in dimension `axis`
+        axis : dimension to interpolate over
+    """
+
+    fp = np.moveaxis(fp, axis, -1)
+    x  = np.moveaxis(x,  axis, -1)
+
+    if xp[0] > xp[-1]:
+        xp = xp[::-1]
+        fp = fp[...,::-1]
+
+    # Index of right neighbour; values outside `xp` use the first/last interval.
+    k = np.clip(np.searchsorted(xp, x), 1, xp.size-1)
+
+    x0 = xp[k-1]
+    f0 = np.take_along_axis(fp, k-1, axis=-1)
+    f1 = np.take_along_axis(fp, k,   axis=-1)
+
+    slope = (f1 - f0) / (xp[k] - x0)
+    return np.moveaxis(f0 + slope * (x - x0), -1, axis)
+
+def nearest_index(x, value):
+    """
+    Index of the element in the 1D monotonic (increasing or decreasing)
+    array `x` which is nearest to `value`. Equivalent to `np.abs(x-value).argmin()`,
+    but uses a binary search instead of evaluating the full array.
+    """
+
+    if x.size == 1:
+        return 0
+
+    descending = x[0] > x[-1]
+    xs = x[::-1] if descending else x
+
+    k = int(np.clip(np.searchsorted(xs, value), 1, xs.size-1))
+
+    # Pick left or right neighbour; in case of a tie, the first one in `x`.
+    if descending:
+        k -= bool(value - xs[k-1] < xs[k] - value)
+        return x.size-1-k
+    else:
+        k -= bool(value - xs[k-1] <= xs[k] - value)
+        return k